@@ -9,17 +9,19 @@ import argparse
 import json
 import re
 import sys
+import textwrap
 from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, TextIO, Tuple
 
 from format_json import format_json_prettier
 from git_utils import (
     Commit,
+    get_commits,
     get_commits_between,
     get_tags,
     is_working_tree_dirty,
-    run_git_command,
+    run_git_command_uncached,
 )
 
 CATEGORY_MAP = {
@@ -45,38 +47,44 @@ CATEGORY_MAP = {
     "locale": "Locale",
 }
 
+# Category order (official categories first), deduplicated since several
+# prefixes could map to the same category
+_CATEGORY_ORDER = tuple(dict.fromkeys(CATEGORY_MAP.values()))
+
 # Prefixes to ignore (commits with these prefixes will be skipped)
 IGNORED_PREFIXES = {"release"}
 
 
-def parse_commit_line(line: str) -> Tuple[str, str] | None:
-    """Parse a single commit line to extract category and description.
-    Returns (category, description) if line matches pattern, None otherwise.
-    """
-    if not line or not line.strip():
-        return None
-
-    line = line.strip()
-    # Remove leading dash and whitespace if present (for body lines)
-    line = re.sub(r"^-\s*", "", line)
+# Wraps entry lines at 80 characters without splitting words
+_ENTRY_WRAPPER = textwrap.TextWrapper(
+    width=80,
+    initial_indent="    - ",
+    subsequent_indent="      ",
+    break_long_words=False,
+    break_on_hyphens=False,
+)
 
-    # Match pattern like "prefix: description" or "prefix(scope): description"
-    match = re.match(r"^([a-zA-Z]+)(?:\([^)]+\))?\s*:\s*(.+)$", line)
+# Matches "prefix: description" or "prefix(scope): description" on any line,
+# optionally indented and led by a dash (for body lines)
+_LINE_RE = re.compile(
+    r"^[^\S\n]*-?[^\S\n]*([a-zA-Z]+)(?:\([^)\n]+\))?[^\S\n]*:[^\S\n]*(\S.*)$",
+    re.MULTILINE,
+)
 
-    if match:
-        prefix = match.group(1).lower()
 
-        # Skip ignored prefixes
-        if prefix in IGNORED_PREFIXES:
-            return None
+def _parse_match(match: re.Match) -> Tuple[str, str] | None:
+    """Convert a `_LINE_RE` match to (category, description), None if ignored."""
+    prefix = match.group(1).lower()
 
-        description = match.group(2).strip()
+    # Skip ignored prefixes
+    if prefix in IGNORED_PREFIXES:
+        return None
 
-        # Map prefix to category
-        category = CATEGORY_MAP.get(prefix, "Changes")
-        return category, description
+    description = match.group(2).strip()
 
-    return None
+    # Map prefix to category
+    category = CATEGORY_MAP.get(prefix, "Changes")
+    return category, description
 
 
 def categorize_commits(commits: List[Commit]) -> Dict[str, List[str]]:
@@ -84,27 +92,26 @@ def categorize_commits(commits: List[Commit]) -> Dict[str, List[str]]:
     categorized = defaultdict(list)
 
     for commit in commits:
-        # Parse subject line
-        result = parse_commit_line(commit["subject"])
-        if result:
-            category, description = result
-            categorized[category].append(description)
-
-        # Parse body lines
-        if commit.get("body"):
-            for line in commit["body"].split("\n"):
-                result = parse_commit_line(line)
-                if result:
-                    category, description = result
-                    categorized[category].append(description)
+        # Scan the subject and every body line in a single pass
+        text = commit["subject"] + "\n" + (commit.get("body") or "")
+        for match in _LINE_RE.finditer(text):
+            result = _parse_match(match)
+            if result:
+                category, description = result
+                categorized[category].append(description)
 
     return dict(categorized)
 
 
 def format_changelog_entry(
-    version: str, date: str, categories: Dict[str, List[str]]
-) -> str:
-    """Format a single changelog entry according to Factorio's requirements."""
+    version: str,
+    date: str,
+    categories: Dict[str, List[str]],
+    out: TextIO | None = None,
+) -> str | None:
+    """Format a single changelog entry according to Factorio's requirements.
+    If `out` is given, each line is written to it directly and None is returned.
+    """
     lines = []
 
     lines.append("-" * 99)
@@ -125,19 +132,11 @@ def format_changelog_entry(
     # Add an empty line before categories
     lines.append("")
 
-    # Define category order (official categories first)
-    category_order = CATEGORY_MAP.values()
-
     # Sort categories according to defined order
-    sorted_categories = []
-    for cat in category_order:
-        if cat in categories:
-            sorted_categories.append(cat)
+    sorted_categories = [cat for cat in _CATEGORY_ORDER if cat in categories]
 
     # Add any categories not in the predefined order
-    for cat in categories:
-        if cat not in sorted_categories:
-            sorted_categories.append(cat)
+    sorted_categories += [cat for cat in categories if cat not in _CATEGORY_ORDER]
 
     # Add categories and their entries
     for category in sorted_categories:
@@ -146,46 +145,17 @@ def format_changelog_entry(
         # Category line: 2 spaces indent, ends with colon
         lines.append(f"  {category}:")
 
-        # Entry lines: 4 spaces indent, starts with "- "
+        # Entry lines: 4 spaces indent, starts with "- ", long lines wrapped
         for entry in entries:
-            # Wrap long lines
-            words = entry.split()
-            current_line = []
-            current_length = 0
-            is_first_line = True
-
-            for word in words:
-                word_length = len(word) + 1  # +1 for space
-
-                if not current_line:
-                    # First word on the line
-                    current_line.append(word)
-                    if is_first_line:
-                        current_length = 6 + len(word)  # "    - " + word
-                    else:
-                        current_length = 6 + len(word)  # "      " + word (continuation)
-                elif current_length + word_length <= 80:
-                    # Add word to current line
-                    current_line.append(word)
-                    current_length += word_length
-                else:
-                    # Write current line and start a new one
-                    if is_first_line:
-                        lines.append(f"    - {' '.join(current_line)}")
-                        is_first_line = False
-                    else:
-                        lines.append(f"      {' '.join(current_line)}")
-                    current_line = [word]
-                    current_length = 6 + len(word)
-
-            # Write the last line
-            if current_line:
-                if is_first_line:
-                    lines.append(f"    - {' '.join(current_line)}")
-                else:
-                    lines.append(f"      {' '.join(current_line)}")
-
-    return "\n".join(lines)
+            lines.extend(_ENTRY_WRAPPER.wrap(" ".join(entry.split())))
+
+    if out is None:
+        return "\n".join(lines)
+
+    for line in lines:
+        out.write(line)
+        out.write("\n")
+    return None
 
 
 def generate_changelog(output_file: str = "changelog.txt"):
@@ -199,52 +169,9 @@ def generate_changelog(output_file: str = "changelog.txt"):
         print("No tags found in repository. Please create tags for your releases.")
         sys.exit(1)
 
-    changelog_entries = []
-
-    # Process each tag (starting from newest)
-    for i, (tag, tag_date) in enumerate(tags):
-        print(f"Processing {tag}...")
-
-        # Get version number from tag (remove 'v' prefix if present)
-        version = tag.lstrip("v")
-
-        # Get commits since previous tag (or from beginning)
-        if i < len(tags) - 1:
-            previous_tag = tags[i + 1][0]
-            commits = get_commits_between(previous_tag, tag)
-        else:
-            # First tag - get all commits up to this tag from beginning
-            output = run_git_command(["log", "--format=%H", tag])
-            if output:
-                commit_hashes = output.split("\n")
-                commits = []
-                for commit_hash in commit_hashes:
-                    if not commit_hash:
-                        continue
-                    subject = run_git_command(["log", "-1", "--format=%s", commit_hash])
-                    body = run_git_command(["log", "-1", "--format=%b", commit_hash])
-                    date = run_git_command(["log", "-1", "--format=%ai", commit_hash])
-                    commits.append(
-                        {
-                            "hash": commit_hash,
-                            "subject": subject,
-                            "body": body,
-                            "date": date,
-                        }
-                    )
-            else:
-                commits = []
-
-        if commits:
-            # Categorize commits
-            categories = categorize_commits(commits)
-
-            # Format changelog entry
-            entry = format_changelog_entry(version, tag_date, categories)
-            changelog_entries.append(entry)
-
-    # Check for unreleased changes (commits after latest tag)
-    if tags:
+    # Write each entry to the changelog file as soon as it is formatted
+    with open(output_file, "w", encoding="utf-8") as f:
+        # Check for unreleased changes (commits after latest tag)
         latest_tag = tags[0][0]
         unreleased_commits = get_commits_between(latest_tag)
 
@@ -252,15 +179,29 @@ def generate_changelog(output_file: str = "changelog.txt"):
             print("Found unreleased changes...")
             categories = categorize_commits(unreleased_commits)
             current_date = datetime.now().isoformat()
-            entry = format_changelog_entry("Unreleased", current_date, categories)
-            changelog_entries.insert(0, entry)
+            format_changelog_entry("Unreleased", current_date, categories, f)
 
-    # Write changelog file
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("\n".join(changelog_entries))
-        # Ensure file ends with a newline
-        if not changelog_entries[-1].endswith("\n"):
-            f.write("\n")
+        # Process each tag (starting from newest)
+        for i, (tag, tag_date) in enumerate(tags):
+            print(f"Processing {tag}...")
+
+            # Get version number from tag (remove 'v' prefix if present)
+            version = tag.lstrip("v")
+
+            # Get commits since previous tag (or from beginning)
+            if i < len(tags) - 1:
+                previous_tag = tags[i + 1][0]
+                commits = get_commits_between(previous_tag, tag)
+            else:
+                # First tag - get all commits up to this tag from beginning
+                commits = get_commits(tag)
+
+            if commits:
+                # Categorize commits
+                categories = categorize_commits(commits)
+
+                # Format changelog entry
+                format_changelog_entry(version, tag_date, categories, f)
 
     print(f"Changelog generated successfully: {output_file}")
 
@@ -268,14 +209,14 @@ def generate_changelog(output_file: str = "changelog.txt"):
 def create_release_commit(changelog_file: str, info_json_path: str, tag_version: str):
     """Create a commit with changelog and info.json changes, then move the tag to this commit."""
     # Stage the files
-    run_git_command(["add", changelog_file, info_json_path])
+    run_git_command_uncached(["add", changelog_file, info_json_path])
 
     # Create commit with release message
     commit_message = f"release: {tag_version}"
-    run_git_command(["commit", "--message", commit_message])
+    run_git_command_uncached(["commit", "--message", commit_message])
 
     # Move the tag to the new commit (HEAD)
-    run_git_command(["tag", "--force", tag_version])
+    run_git_command_uncached(["tag", "--force", tag_version])
 
     print(f"Created commit: {commit_message}")
     print(f"Moved tag {tag_version} to HEAD")
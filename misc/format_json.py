@@ -2,58 +2,96 @@
 Module providing functionality to format JSON data using prettier's formatting style.
 """
 
+import io
 import json
+from functools import lru_cache
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+@lru_cache(maxsize=4096)
+def _enc_key(k: str) -> str:
+    """Encode an object key, memoized since the same keys recur throughout."""
+    return json.dumps(k, ensure_ascii=False)
+
+
+def _needs_custom(obj, max_line_length):
+    """Check whether prettier-style output would differ from `json.dumps`.
+    That is the case when some array of scalars gets collapsed onto one line,
+    or for anything the standard library encodes differently (e.g. non-string
+    keys).
+    """
+    if isinstance(obj, dict):
+        return any(
+            not isinstance(k, str) or _needs_custom(v, max_line_length)
+            for k, v in obj.items()
+        )
+
+    if isinstance(obj, list):
+        if obj and all(isinstance(x, _SCALAR_TYPES) for x in obj):
+            return len(json.dumps(obj, ensure_ascii=False)) <= max_line_length
+        return any(_needs_custom(x, max_line_length) for x in obj)
+
+    return isinstance(obj, tuple)
 
 
 def format_json_prettier(obj, indent=2, max_line_length=80):
     """Format JSON with prettier-style formatting."""
+    if not _needs_custom(obj, max_line_length):
+        # Nothing to collapse, so the C encoder already produces the same output
+        return json.dumps(obj, indent=indent, ensure_ascii=False)
+
+    buf = io.StringIO()
 
-    def format_value(value, current_indent):
+    def write_value(value, current_indent):
         if isinstance(value, dict):
             if not value:
-                return "{}"
+                buf.write("{}")
+                return
 
-            lines = ["{"]
-            items = list(value.items())
-            for i, (k, v) in enumerate(items):
-                formatted_value = format_value(v, current_indent + indent)
-                comma = "," if i < len(items) - 1 else ""
+            padding = " " * (current_indent + indent)
+            buf.write("{\n")
+            for i, (k, v) in enumerate(value.items()):
+                buf.write(f"{padding}{_enc_key(k)}: ")
 
                 # Check if value is a simple array that fits on one line
-                if isinstance(v, list) and all(
-                    isinstance(x, (str, int, float, bool, type(None))) for x in v
-                ):
+                json_str = None
+                if isinstance(v, list) and all(isinstance(x, _SCALAR_TYPES) for x in v):
                     json_str = json.dumps(v, ensure_ascii=False)
-                    if len(json_str) <= max_line_length - current_indent - len(k) - 5:
-                        formatted_value = json_str
+                    if len(json_str) > max_line_length - current_indent - len(k) - 5:
+                        json_str = None
 
-                lines.append(
-                    f"{' ' * (current_indent + indent)}{json.dumps(k)}: {formatted_value}{comma}"
-                )
-            lines.append(f"{' ' * current_indent}}}")
-            return "\n".join(lines)
+                if json_str is None:
+                    write_value(v, current_indent + indent)
+                else:
+                    buf.write(json_str)
+                buf.write(",\n" if i < len(value) - 1 else "\n")
+            buf.write(f"{' ' * current_indent}}}")
+            return
 
         if isinstance(value, list):
             if not value:
-                return "[]"
+                buf.write("[]")
+                return
 
             # Check if all items are simple and the whole array fits on one line
-            if all(isinstance(x, (str, int, float, bool, type(None))) for x in value):
+            if all(isinstance(x, _SCALAR_TYPES) for x in value):
                 json_str = json.dumps(value, ensure_ascii=False)
                 if len(json_str) <= max_line_length:
-                    return json_str
+                    buf.write(json_str)
+                    return
 
             # Otherwise, format with each item on a new line
-            lines = ["["]
+            padding = " " * (current_indent + indent)
+            buf.write("[\n")
             for i, item in enumerate(value):
-                formatted_item = format_value(item, current_indent + indent)
-                comma = "," if i < len(value) - 1 else ""
-                lines.append(
-                    f"{' ' * (current_indent + indent)}{formatted_item}{comma}"
-                )
-            lines.append(f"{' ' * current_indent}]")
-            return "\n".join(lines)
+                buf.write(padding)
+                write_value(item, current_indent + indent)
+                buf.write(",\n" if i < len(value) - 1 else "\n")
+            buf.write(f"{' ' * current_indent}]")
+            return
 
-        return json.dumps(value, ensure_ascii=False)
+        buf.write(json.dumps(value, ensure_ascii=False))
 
-    return format_value(obj, 0)
+    write_value(obj, 0)
+    return buf.getvalue()
@@ -4,6 +4,7 @@ Module providing utility functions to interact with Git repositories.
 
 import subprocess
 import sys
+from functools import lru_cache
 from typing import List, Tuple, TypedDict
 
 
@@ -17,54 +18,87 @@ class Commit(TypedDict):
 
 
 def run_git_command(args: List[str]) -> str:
+    """Execute a read-only git command and return its output.
+    Results are cached for the rest of the run, so commands which change the
+    repository (or inspect the working tree) must use `run_git_command_uncached`.
+    """
+    return _cached_git(tuple(args))
+
+
+@lru_cache(maxsize=1024)
+def _cached_git(args: Tuple[str, ...]) -> str:
+    """Cached backend of `run_git_command`, keyed on the argument tuple."""
+    return _run_git(list(args))
+
+
+def run_git_command_uncached(args: List[str]) -> str:
+    """Execute a git command bypassing the cache and return its output.
+    Since the command may change the repository, all cached results are dropped.
+    """
+    try:
+        return _run_git(args)
+    finally:
+        _cached_git.cache_clear()
+
+
+def _run_git(args: List[str]) -> str:
     """Execute a git command and return its output."""
     try:
+        # Read raw bytes and decode once at the end instead of via text mode
         result = subprocess.run(
-            ["git"] + args, capture_output=True, text=True, check=True
+            ["git"] + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
         )
-        return result.stdout.strip()
+        return result.stdout.strip().decode("utf-8", "replace")
     except subprocess.CalledProcessError as e:
         print(f"Error running git command: {e}", file=sys.stderr)
-        print(f"Output: {e.output}", file=sys.stderr)
+        print(f"Output: {e.output.decode('utf-8', 'replace')}", file=sys.stderr)
         sys.exit(1)
 
 
 def get_tags() -> List[Tuple[str, str]]:
     """Get all tags sorted by commit date (newest first)."""
-    output = run_git_command(["tag", "--sort=-creatordate"])
+    # Fetch every tag with the author date of its commit in a single call.
+    # Lightweight tags fill %(authordate), annotated ones fill %(*authordate).
+    output = run_git_command(
+        [
+            "for-each-ref",
+            "--sort=-creatordate",
+            "--format=%(refname:short)%09%(authordate:iso)%(*authordate:iso)",
+            "refs/tags",
+        ]
+    )
     if not output:
         return []
 
     tags = []
-    for tag in output.split("\n"):
-        if tag:
-            # Get the author date for this tag
-            date_str = run_git_command(["log", "-1", "--format=%ai", tag])
+    for line in output.split("\n"):
+        if line:
+            tag, date_str = line.split("\t", 1)
             tags.append((tag, date_str))
 
     return tags
 
 
-def get_commits_between(tag_from: str, tag_to: str = "HEAD") -> List[Commit]:
-    """Get commits between two tags (or from tag to HEAD)."""
-    revision_range = f"{tag_from}..{tag_to}"
-
-    # Get commit hashes
-    output = run_git_command(["log", "--format=%H", revision_range])
+def get_commits(revision: str) -> List[Commit]:
+    """Get all commits reachable from a revision (or revision range)."""
+    # Fetch every field in one call: records are NUL-separated (-z) and
+    # fields are separated by the ASCII unit separator
+    output = run_git_command(["log", "-z", "--format=%H%x1f%s%x1f%b%x1f%ai", revision])
     if not output:
         return []
 
-    commit_hashes = output.split("\n")
     commits: List[Commit] = []
 
-    for commit_hash in commit_hashes:
-        if not commit_hash:
+    for record in output.split("\0"):
+        if not record:
             continue
 
-        # Get commit subject, body, and date
-        subject = run_git_command(["log", "-1", "--format=%s", commit_hash])
-        body = run_git_command(["log", "-1", "--format=%b", commit_hash])
-        date = run_git_command(["log", "-1", "--format=%ai", commit_hash])
+        commit_hash, subject, body, date = (
+            field.strip() for field in record.split("\x1f")
+        )
 
         commits.append(
             {"hash": commit_hash, "subject": subject, "body": body, "date": date}
@@ -73,7 +107,12 @@ def get_commits_between(tag_from: str, tag_to: str = "HEAD") -> List[Commit]:
     return commits
 
 
+def get_commits_between(tag_from: str, tag_to: str = "HEAD") -> List[Commit]:
+    """Get commits between two tags (or from tag to HEAD)."""
+    return get_commits(f"{tag_from}..{tag_to}")
+
+
 def is_working_tree_dirty() -> bool:
     """Check if the git working tree is not clean."""
-    status = run_git_command(["status", "--porcelain"])
+    status = run_git_command_uncached(["status", "--porcelain"])
     return bool(status)